@@ -5,14 +5,17 @@ Implémentation de deux fonctions appliquant la méthode des
 permettant de normaliser puis d'afficher les fonctions propres résultantes. 
 """
 
+from functools import partial
 import numpy as np
 import mef
 import mt
 import scipy.sparse as sp
+from scipy.linalg import solve_banded
+from threadpoolctl import threadpool_limits
 import matplotlib.pyplot as plt
 
 
-def normaliseur(valeurs):
+def normaliseur(valeurs, axis=0):
     """ Normalise une liste de valeurs au sens de la somme 
     de sa valeur absolue au carré (\sum_i |f_i|^2 = 1). Ce 
     type de normalisation est fondamental en mécanique 
@@ -20,15 +23,18 @@ def normaliseur(valeurs):
 
     Arguments
     ---------
-    valeurs : list[float]
-        Liste des données à normaliser.
+    valeurs : list[float] or array(float, ndims=2)
+        Liste des données à normaliser. Un tableau 2D est 
+        normalisé indépendamment le long de l'axe `axis`.
+    axis : int
+        L'axe le long duquel normaliser (0 pour les colonnes).
 
     Retour
     ------
-    list[float]
+    list[float] or array(float, ndims=2)
         Les données normalisées. 
     """
-    return valeurs/np.sqrt(np.sum(np.square(valeurs)))
+    return valeurs/np.linalg.norm(valeurs, axis=axis, keepdims=True)
 
 
 def solutions_mef(L, N_points, N_solutions):
@@ -60,27 +66,37 @@ def solutions_mef(L, N_points, N_solutions):
 
     elems_finis = mef.Grille(x_grid) # initialisation d'un instance de Grille
 
-    # définition des matrices utiles dans la MEF
-    laplacien = elems_finis.matrice_laplacienne_interne() # d_x^2
-    potentiel = elems_finis.matrice_potentiel(lambda x: x*x) # x^2
-    matrice_masse = elems_finis.matrice_masse_interne()
-    matrice_masse_inv = sp.linalg.inv(matrice_masse)
+    # définition des diagonales des matrices utiles dans la MEF
+    diag_L, hors_diag_L = elems_finis.diagonales_laplacienne_interne() # d_x^2
+    diag_V, hors_diag_V = elems_finis.diagonales_potentiel(np.square) # x^2
+    diag_M, hors_diag_M = elems_finis.diagonales_masse_interne()
 
-    L_C = (potentiel - laplacien)/2 # Opérateur différentiel (x^2 - d_x^2)/2 
-    
-    # Calcul des `N_solutions` premiers vecteurs/valeurs propres
-    eigvals, eigvecs = sp.linalg.eigsh(L_C, M=matrice_masse, which="SM", k=N_solutions)
+    # Diagonales de l'opérateur différentiel (x^2 - d_x^2)/2
+    diag_LC, hors_diag_LC = 0.5*(diag_V - diag_L), 0.5*(hors_diag_V - hors_diag_L)
 
+    # Opérateurs tridiagonaux construits directement à partir des diagonales (sans matrice creuse).
+    # En mode shift-invert, ARPACK n'applique que L_C_inv = (L_C - sigma*M)^-1 (sigma = 0),
+    # factorisé une seule fois, et le produit par M; L_C ne fixe que la forme du problème.
+    L_C = mef.operateur_tridiagonal(diag_LC, hors_diag_LC)
+    matrice_masse = mef.operateur_tridiagonal(diag_M, hors_diag_M)
+    L_C_inv = mef.operateur_tridiagonal_inverse(diag_LC, hors_diag_LC)
     
-    eigvecs_repr_pos = np.empty_like(eigvecs) # initialisation du tableau de fonctions propres
-    for i in range(len(eigvals)):
-        # transformation des vect. propres dans la repr. pos. et normalisation
-        eigvecs_repr_pos[:,i] = normaliseur(matrice_masse_inv.dot(eigvecs[:,i]))
+    # Les systèmes tridiagonaux sont trop petits pour profiter d'un BLAS multifil:
+    # on force un seul fil pour éviter le coût de démarrage (et la sursouscription
+    # si plusieurs processus sont utilisés).
+    with threadpool_limits(limits=1, user_api="blas"):
+        # Calcul des `N_solutions` premiers vecteurs/valeurs propres (mode shift-invert autour de 0)
+        eigvals, eigvecs = sp.linalg.eigsh(L_C, M=matrice_masse, sigma=0.0, which="LM", k=N_solutions, OPinv=L_C_inv)
+
+        # transformation des vect. propres dans la repr. pos. (un seul solveur tridiagonal LAPACK
+        # pour toutes les colonnes) et normalisation de chaque colonne
+        matrice_masse_bande = elems_finis.matrice_masse_bande()
+        eigvecs_repr_pos = normaliseur(solve_banded((1, 1), matrice_masse_bande, eigvecs), axis=0)
 
     return eigvals, x_grid[1:-1], eigvecs_repr_pos
 
 
-def solutions_mt(L, N_points, N_solutions, vec_0=[0,0.001], val_0=0.2, D=-0.01, rtol_cadrage=0.1, max_iter_cadrage=20, val_max=10):
+def solutions_mt(L, N_points, N_solutions, vec_0=[0,0.001], val_0=0.2, D=0.01, val_max=10, n_processus=1):
     """Fonction qui génère les premières solutions à l'équation 
     de Schrodinger pour l'oscillateur harmonique quantique sur 
     une grille unidimensionnelle centrée en 0 grâce à la méthode 
@@ -101,15 +117,12 @@ def solutions_mt(L, N_points, N_solutions, vec_0=[0,0.001], val_0=0.2, D=-0.01,
         Valeur initiale du balayage pour le cadrage de racines
         en fonction de l'énergie.
     D : float
-        Le pas de l'algoritme de cadrage de racine.
-    rtol_cadrage : float
-        La tolérance relative employée dans le processus de 
-        cadrage de racine pour l'équation f(x_1) = -f(x_0).
-    max_iter : int
-        Le nombre maximal de pas dans le processus de cadrage 
-        avant d'avancer la borne val_0.
+        Le pas du balayage de cadrage de racine.
     val_max : float
         L'énergie maximale permise pour les solutions.
+    n_processus : int or None
+        Le nombre de processus utilisés pour raffiner les racines 
+        en parallèle (None pour utiliser tous les coeurs).
 
     Retour
     ------
@@ -123,8 +136,8 @@ def solutions_mt(L, N_points, N_solutions, vec_0=[0,0.001], val_0=0.2, D=-0.01,
     """
     x_grid = np.linspace(-L, L, N_points) # génération de la grille
     
-    # définition d'une fonction retournant psi(L) en fonction de l'énergie
-    BC_de_E = lambda E : mt.calcul_Schrodinger(vec_0, x_grid, E)[-1,0]
+    # définition d'une fonction (vectorisée et sérialisable) retournant psi(L) en fonction de l'énergie
+    BC_de_E = partial(mt.BC_de_E, vec_0=vec_0, x_range=x_grid)
     
     # Trouver les premières racines
     racines = mt.trouver_premieres_racines(
@@ -132,17 +145,15 @@ def solutions_mt(L, N_points, N_solutions, vec_0=[0,0.001], val_0=0.2, D=-0.01,
         val_0, 
         N_solutions, 
         D=D, 
-        rtol=rtol_cadrage, 
-        max_iter=max_iter_cadrage, 
-        val_max=val_max
+        val_max=val_max,
+        n_processus=n_processus
     )
     
-    # Calcul fonctions propres
-    fonctions_propres = np.empty((N_points, len(racines)))
-
-    for i in range(len(racines)):
-        # normalisation des fonctions et mise en forme
-        fonctions_propres[:,i] = normaliseur(mt.calcul_Schrodinger(vec_0, x_grid, racines[i])[:,0])
+    # Calcul fonctions propres (une par colonne)
+    psi_mat = np.stack([mt.calcul_Schrodinger(vec_0, x_grid, r)[:,0] for r in racines], axis=1)
+    
+    # normalisation des fonctions en un seul appel
+    fonctions_propres = normaliseur(psi_mat, axis=0)
 
     return racines, x_grid, fonctions_propres
         
@@ -174,9 +185,15 @@ def faire_graphique(sol, scale, E_roundoff, titre=None):
     """
     plt.figure() # initialiser la figure
 
-    for i in range(len(sol[0])):
-        # faire un graphique de chaque fonction propre décalée par son énergie
-        plt.plot(sol[1], scale*sol[2][:,i] + sol[0][i], label = f"$E_{i}$" + " = " + str(round(sol[0][i], E_roundoff)))
+    # décaler chaque fonction propre (colonne) par son énergie
+    energies = np.asarray(sol[0])
+    fonctions_decalees = scale*sol[2] + energies[np.newaxis,:]
+
+    # faire un graphique de toutes les fonctions propres en un seul appel
+    lignes = plt.plot(sol[1], fonctions_decalees)
+
+    for i, ligne in enumerate(lignes):
+        ligne.set_label(f"$E_{i}$" + " = " + str(round(energies[i], E_roundoff)))
 
     plt.xlabel("x")
     plt.ylabel("$\psi_i + E_i$")
@@ -7,7 +7,8 @@ de David Sénéchal.
 """
 import numpy as np
 import scipy.sparse as sp
-import scipy.integrate as integrate
+import scipy.sparse.linalg as spla
+from scipy.linalg import lapack
 
 
 class Grille:
@@ -20,10 +21,14 @@ class Grille:
     """
 
     def __init__(self, points):
+        points = np.ascontiguousarray(points)
+        # Espacements entre points voisins, réutilisés par les matrices.
+        h = np.diff(points)
         # On s'assure que les points sont ordonnées.
-        if np.any((points[1:] - points[:-1]) < 0.0):
+        if (h < 0.0).any():
             raise ValueError("les points ne sont pas ordonnés")
         self.points = points
+        self._h = h
 
     def __len__(self):
         """Nombre de points sur la grille."""
@@ -37,19 +42,32 @@ class Grille:
         Ainsi, l'élément (0, 0) de la matrice retournée
         représente la valeur (1, 1) de la matrice complète.
         """
-        n = len(self)
-        matrice = sp.dok_matrix((n - 2, n - 2))
+        return matrice_tridiagonale(*self.diagonales_masse_interne())
+
+    def matrice_masse_bande(self):
+        """Retourne la matrice de masse interne sous la forme bande
+        (3, len(grille) - 2) attendue par scipy.linalg.solve_banded
+        avec (l, u) = (1, 1).
+
+        La ligne 0 contient la sur-diagonale, la ligne 1 la diagonale
+        centrale et la ligne 2 la sous-diagonale.
+        """
+        diagonale, hors_diagonale = self.diagonales_masse_interne()
+        bande = np.zeros((3, len(diagonale)))
+        bande[0, 1:] = hors_diagonale
+        bande[1] = diagonale
+        bande[2, :-1] = hors_diagonale
+        return bande
+
+    def diagonales_masse_interne(self):
+        """Retourne la diagonale centrale et les autres diagonales
+        (symétriques) de la matrice de masse interne."""
+        h = self._h
         # On calcule les valeurs sur la diagonale centrale.
-        for site in range(1, n - 1):
-            matrice[site - 1, site - 1] = (
-                self.points[site + 1] - self.points[site - 1]
-            ) / 3.0
+        diagonale = (h[:-1] + h[1:]) / 3.0
         # On calcule les valeurs sur les autres diagonales.
-        for site in range(1, n - 2):
-            valeur = (self.points[site + 1] - self.points[site]) / 6.0
-            matrice[site - 1, site] = valeur
-            matrice[site, site - 1] = valeur
-        return matrice.tocsc()
+        hors_diagonale = h[1:-1] / 6.0
+        return diagonale, hors_diagonale
 
     def matrice_laplacienne_interne(self):
         """Retourne la matrice de l'opérateur différentiel (D^2) de la grille
@@ -59,22 +77,20 @@ class Grille:
         Ainsi, l'élément (0, 0) de la matrice retournée
         représente la valeur (1, 1) de la matrice complète.
         """
-        n = len(self)
-        matrice = sp.dok_matrix((n - 2, n - 2))
+        return matrice_tridiagonale(*self.diagonales_laplacienne_interne())
+
+    def diagonales_laplacienne_interne(self):
+        """Retourne la diagonale centrale et les autres diagonales
+        (symétriques) de la matrice laplacienne interne."""
+        # Inverses des espacements (positifs) entre points voisins.
+        inv = 1.0 / self._h
         # On calcule les valeurs sur la diagonale centrale.
-        for site in range(1, n - 1):
-            matrice[site - 1, site - 1] = sum(
-                1.0 / (self.points[i] - self.points[i + 1])
-                for i in [site - 1, site]
-            )
+        diagonale = -(inv[:-1] + inv[1:])
         # On calcule les valeurs sur les autres diagonales.
-        for site in range(1, n - 2):
-            valeur = 1.0 / (self.points[site + 1] - self.points[site])
-            matrice[site - 1, site] = valeur
-            matrice[site, site - 1] = valeur
-        return matrice.tocsc()
+        hors_diagonale = inv[1:-1]
+        return diagonale, hors_diagonale
 
-    def matrice_potentiel(self, potentiel):
+    def matrice_potentiel(self, potentiel, ordre_quadrature=5):
         """Retourne la matrice de potentiel de la grille
         sous forme de scipy.sparse.csc_matrix.
 
@@ -82,54 +98,123 @@ class Grille:
         Ainsi, l'élément (0, 0) de la matrice retournée
         représente la valeur (1, 1) de la matrice complète.
 
+        Voir diagonales_potentiel pour les arguments.
+        """
+        return matrice_tridiagonale(
+            *self.diagonales_potentiel(potentiel, ordre_quadrature)
+        )
+
+    def diagonales_potentiel(self, potentiel, ordre_quadrature=5):
+        """Retourne la diagonale centrale et les autres diagonales
+        (symétriques) de la matrice de potentiel interne.
+
+        Les intégrales sont évaluées par une quadrature de Gauss-Legendre
+        d'ordre fixe appliquée simultanément à tous les intervalles.
+
         Arguments
         ---------
 
-        potentiel: une fonction de float vers float représentant
-                   le potentiel à calculer.
+        potentiel: une ufunc de NumPy (par exemple np.square) ou une
+                   fonction se comportant comme telle, représentant le
+                   potentiel à calculer. Elle est appelée une seule fois
+                   sur un tableau de forme (len(grille) - 1, ordre_quadrature)
+                   et doit retourner un tableau de même forme.
+        ordre_quadrature: le nombre de points de Gauss-Legendre utilisés
+                          sur chaque intervalle.
         """
-        # Calcule les ratios pour les intégrales.
-        def pente_pos(x, site):
-            num = x - self.points[site - 1]
-            denom = self.points[site] - self.points[site - 1]
-            return num / denom
+        noeuds, poids = np.polynomial.legendre.leggauss(ordre_quadrature)
+        d = self.points
+        h = self._h
 
-        def pente_neg(x, site):
-            num = self.points[site + 1] - x
-            denom = self.points[site + 1] - self.points[site]
-            return num / denom
+        # Points de quadrature sur chaque intervalle [x_i, x_{i+1}].
+        centres = 0.5 * (d[1:] + d[:-1])
+        xq = centres[:, np.newaxis] + 0.5 * h[:, np.newaxis] * noeuds
+        V = potentiel(xq)
 
-        n = len(self)
-        matrice = sp.dok_matrix((n - 2, n - 2))
+        # Fonctions de base décroissante (gauche) et croissante (droite)
+        # de l'intervalle évaluées aux noeuds de quadrature.
+        phi_gauche = 0.5 * (1.0 - noeuds)
+        phi_droite = 0.5 * (1.0 + noeuds)
+        produits = np.stack(
+            [phi_gauche**2, phi_droite**2, phi_gauche * phi_droite], axis=1
+        )
 
-        # On calcule les valeurs sur la diagonale centrale.
-        for site in range(1, n - 1):
-            valeur_pos = integrate.quad(
-                lambda x: potentiel(x) * pente_pos(x, site)**2,
-                self.points[site - 1],
-                self.points[site]
-            )[0]
-            valeur_neg = integrate.quad(
-                lambda x: potentiel(x) * pente_neg(x, site)**2,
-                self.points[site],
-                self.points[site + 1]
-            )[0]
-            matrice[site - 1, site - 1] = valeur_pos + valeur_neg
+        # Les trois intégrales de chaque intervalle en une seule contraction.
+        poids_produits = poids[:, np.newaxis] * produits
+        integrales = 0.5 * h[:, np.newaxis] * (V @ poids_produits)
+        valeur_gauche, valeur_droite, valeur_croisee = integrales.T
 
+        # On calcule les valeurs sur la diagonale centrale.
+        diagonale = valeur_droite[:-1] + valeur_gauche[1:]
         # On calcule les valeurs sur les autres diagonales.
-        for site in range(1, n - 2):
-            valeur = integrate.quad(
-                lambda x: (
-                    potentiel(x)
-                    * pente_pos(x, site + 1)
-                    * pente_neg(x, site)
-                ),
-                self.points[site],
-                self.points[site + 1]
-            )[0]
-            matrice[site - 1, site] = valeur
-            matrice[site, site - 1] = valeur
-        return matrice.tocsr()
+        hors_diagonale = valeur_croisee[1:-1]
+        return diagonale, hors_diagonale
+
+
+def matrice_tridiagonale(diagonale, hors_diagonale):
+    """Assemble une matrice tridiagonale symétrique
+    sous forme de scipy.sparse.csc_matrix."""
+    return sp.diags(
+        [hors_diagonale, diagonale, hors_diagonale],
+        offsets=[-1, 0, 1],
+        format="csc",
+    )
+
+
+def operateur_tridiagonal(diagonale, hors_diagonale):
+    """Retourne le produit par une matrice tridiagonale symétrique sous
+    forme de scipy.sparse.linalg.LinearOperator, sans construire la
+    matrice creuse.
+
+    Les tableaux de sortie sont préalloués (un par nombre de colonnes)
+    et réutilisés d'un appel à l'autre: le résultat doit être copié
+    s'il doit survivre à l'application suivante.
+    """
+    n = len(diagonale)
+    diagonale = diagonale[:, np.newaxis]
+    hors_diagonale = hors_diagonale[:, np.newaxis]
+    tampons = {}
+
+    def produit(v):
+        v = v.reshape(n, -1)
+        if v.shape[1] not in tampons:
+            tampons[v.shape[1]] = (
+                np.empty((n, v.shape[1])), np.empty((n - 1, v.shape[1]))
+            )
+        resultat, temporaire = tampons[v.shape[1]]
+
+        np.multiply(diagonale, v, out=resultat)
+        np.multiply(hors_diagonale, v[1:], out=temporaire)
+        resultat[:-1] += temporaire
+        np.multiply(hors_diagonale, v[:-1], out=temporaire)
+        resultat[1:] += temporaire
+        return resultat
+
+    return spla.LinearOperator(
+        (n, n), matvec=produit, matmat=produit, rmatvec=produit, dtype=float
+    )
+
+
+def operateur_tridiagonal_inverse(diagonale, hors_diagonale):
+    """Retourne la résolution d'un système tridiagonal symétrique sous
+    forme de scipy.sparse.linalg.LinearOperator.
+
+    La factorisation LU (LAPACK ?gttrf) est calculée une seule fois;
+    chaque application ne coûte ensuite qu'une substitution en O(n).
+    """
+    facteurs = lapack.dgttrf(hors_diagonale, diagonale, hors_diagonale)
+    if facteurs[-1] != 0:
+        raise np.linalg.LinAlgError("la matrice tridiagonale est singulière")
+    facteurs = facteurs[:-1]
+
+    def resolution(v):
+        x, _ = lapack.dgttrs(*facteurs, v.reshape(len(diagonale), -1))
+        return x
+
+    n = len(diagonale)
+    return spla.LinearOperator(
+        (n, n), matvec=resolution, matmat=resolution, dtype=float
+    )
 
 
 if __name__ == "__main__":
@@ -145,6 +230,16 @@ if __name__ == "__main__":
         ])
     )
 
+    # Ceci retourne une erreur si les matrices sont différentes.
+    np.testing.assert_allclose(
+        grille.matrice_masse_bande(),
+        np.array([
+            [  0, 1/6, 1/6],
+            [2/3, 2/3, 2/3],
+            [1/6, 1/6,   0],
+        ])
+    )
+
     # Ceci retourne une erreur si les matrices sont différentes.
     np.testing.assert_allclose(
         grille.matrice_laplacienne_interne().toarray(),
@@ -155,6 +250,20 @@ if __name__ == "__main__":
         ])
     )
 
+    # Ceci retourne une erreur si les opérateurs sont différents.
+    diagonales = grille.diagonales_laplacienne_interne()
+    v = np.array([1.0, 2.0, 3.0])
+    np.testing.assert_allclose(
+        operateur_tridiagonal(*diagonales).matvec(v),
+        grille.matrice_laplacienne_interne() @ v,
+    )
+    np.testing.assert_allclose(
+        operateur_tridiagonal_inverse(*diagonales).matvec(
+            operateur_tridiagonal(*diagonales).matvec(v)
+        ),
+        v,
+    )
+
     # Ceci retourne une erreur si les matrices sont différentes.
     np.testing.assert_allclose(
         grille.matrice_potentiel(lambda x: x**2).toarray(),
@@ -6,10 +6,13 @@ quantique (OHQ).
 """
 
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from numba import njit
 from scipy.optimize import brentq
-from scipy.integrate import odeint
 
 
+@njit(cache=True)
 def Schrodinger_RHS(vec, x, E):
     """ Calcule le membre droit (au sens du format requis par les résolveurs 
     d'équations différentielles) de l'équation de Schrodinger en fonction
@@ -26,11 +29,118 @@ def Schrodinger_RHS(vec, x, E):
 
     Retour
     ------
-    array(float, ndims=1, shape=(2))
+    tuple(float, size=2)
         Le membre droit de l'équation de Schrödinger
     """
 
-    return [vec[1], (x*x - 2*E)*vec[0]]
+    return vec[1], (x*x - 2*E)*vec[0]
+
+
+@njit(cache=True, fastmath=True)
+def pas_RK4(psi, dpsi, x, h, E):
+    """ Effectue un pas de Runge-Kutta d'ordre 4 de longueur h 
+    sur l'équation de Schrodinger à partir de la position x.
+
+    Arguments
+    ---------
+    psi, dpsi : float
+        La fonction d'onde et sa dérivée spatiale en x.
+    x : float
+        La position spatiale.
+    h : float
+        La longueur du pas.
+    E : float
+        L'énergie de la particule.
+
+    Retour
+    ------
+    tuple(float, size=2)
+        La fonction d'onde et sa dérivée spatiale en x + h.
+    """
+    k1 = Schrodinger_RHS((psi, dpsi), x, E)
+    k2 = Schrodinger_RHS(
+        (psi + 0.5*h*k1[0], dpsi + 0.5*h*k1[1]), x + 0.5*h, E
+    )
+    k3 = Schrodinger_RHS(
+        (psi + 0.5*h*k2[0], dpsi + 0.5*h*k2[1]), x + 0.5*h, E
+    )
+    k4 = Schrodinger_RHS((psi + h*k3[0], dpsi + h*k3[1]), x + h, E)
+
+    return (
+        psi + h*(k1[0] + 2*k2[0] + 2*k3[0] + k4[0])/6,
+        dpsi + h*(k1[1] + 2*k2[1] + 2*k3[1] + k4[1])/6,
+    )
+
+
+@njit(cache=True, fastmath=True)
+def integrer_RK4(vec_0, x_range, E):
+    """ Intègre l'équation de Schrodinger par Runge-Kutta d'ordre 4 
+    en prenant comme pas les espacements de la grille.
+
+    Arguments
+    ---------
+    vec_0 : array(float, ndims=1, shape=(2))
+        Les conditions initiales de la fonction d'onde à x=-L 
+        sous la forme [psi, psi'].
+    x_range : array(float, ndims=1)
+        La grille sur laquelle solutionner l'équation de Schrodinger.
+    E : float
+        Énergie pour laquelle résoudre l'équation de Schrodinger.
+
+    Retour
+    ------
+    array(float, ndims=2, shape=(len(x_range), 2))
+        La fonction d'onde et sa dérivée spatiale en tout point de la grille.
+    """
+    n = x_range.size
+    sol = np.empty((n, 2))
+    sol[0, 0] = vec_0[0]
+    sol[0, 1] = vec_0[1]
+
+    for i in range(n - 1):
+        sol[i + 1, 0], sol[i + 1, 1] = pas_RK4(
+            sol[i, 0], sol[i, 1], x_range[i], x_range[i + 1] - x_range[i], E
+        )
+
+    return sol
+
+
+@njit(cache=True, fastmath=True)
+def integrer_RK4_frontiere(vec_0, x_range, E_arr):
+    """ Intègre l'équation de Schrodinger par Runge-Kutta d'ordre 4 
+    (mêmes pas que integrer_RK4) pour chacune des énergies, en ne 
+    conservant que la fonction d'onde à la borne x_range[-1].
+
+    Seuls deux scalaires (psi, psi') sont gardés en mémoire par énergie.
+
+    Arguments
+    ---------
+    vec_0 : array(float, ndims=1, shape=(2))
+        Les conditions initiales de la fonction d'onde à x=-L 
+        sous la forme [psi, psi'].
+    x_range : array(float, ndims=1)
+        La grille sur laquelle solutionner l'équation de Schrodinger.
+    E_arr : array(float, ndims=1, shape=(K))
+        Énergies pour lesquelles résoudre l'équation de Schrodinger.
+
+    Retour
+    ------
+    array(float, ndims=1, shape=(K))
+        psi(x_range[-1]) pour chaque énergie.
+    """
+    psi_L = np.empty(E_arr.size)
+
+    for k in range(E_arr.size):
+        psi, dpsi = vec_0[0], vec_0[1]
+
+        for i in range(x_range.size - 1):
+            psi, dpsi = pas_RK4(
+                psi, dpsi, x_range[i], x_range[i + 1] - x_range[i], E_arr[k]
+            )
+
+        psi_L[k] = psi
+
+    return psi_L
 
 
 def calcul_Schrodinger(vec_0, x_range, E):
@@ -54,137 +164,177 @@ def calcul_Schrodinger(vec_0, x_range, E):
         La fonction d'onde et sa dérivée spatiale en tout point de la grille.
     """
 
-    return odeint(Schrodinger_RHS, vec_0, x_range, args=(E,))
+    return integrer_RK4(
+        np.asarray(vec_0, dtype=float),
+        np.asarray(x_range, dtype=float),
+        float(E),
+    )
 
 
-def generateur_cadre(func, val_0, D=-0.1, rtol=0.1, max_iter=20):
-    """ Fonction qui retourne un cadre pour une racine de 
-    f(x) si la condition f(x_1) = -f(x_0) est respectée à 
-    l'intérieur d'une certaine tolérance.
+def BC_de_E(E, vec_0, x_range):
+    """ Retourne la valeur de la fonction d'onde à la borne x_range[-1]
+    en fonction de l'énergie, sans conserver la trajectoire complète. 
+    Étant définie au niveau du module, elle peut être passée (via 
+    functools.partial) à des processus parallèles.
 
     Arguments
     ---------
-    func : function --> float
-        Une fonction scalaire pour laquelle on cherche à 
-        cadrer une racine.
-    val_0 : float
-        Valeur initiale pour le cadre.
-    D : float
-        Incrément de progression de la deuxième borne.
-        (NOTE: Le signe affecte le déplacement de la borne.)
-    rtol : float
-        Tolérance relative dans la condition f(x_1) = -f(x_0)
-    max_iter : int
-        Le nombre maximal de pas dans le processus de cadrage 
-        avant d'avancer la borne val_0.
+    E : float or array(float)
+        Énergie(s) pour lesquelles résoudre l'équation de Schrodinger.
+    vec_0 : list(float)
+        Les conditions initiales de la fonction d'onde à x=-L 
+        sous la forme [psi, psi'].
+    x_range : list(float)
+        La grille sur laquelle solutionner l'équation de Schrodinger.
 
     Retour
     ------
-    tuple(size=2) or None
-        Retourne un cadre sous forme de tuple si détecté,
-        sinon, retourne None.
+    float or array(float)
+        psi(L) pour chaque énergie.
+    """
+    E = np.asarray(E, dtype=float)
+
+    psi_L = integrer_RK4_frontiere(
+        np.asarray(vec_0, dtype=float),
+        np.asarray(x_range, dtype=float),
+        E.ravel(),
+    ).reshape(E.shape)
+
+    return psi_L[()] if E.ndim == 0 else psi_L
+
+
+class FonctionMemoisee:
+    """ Enveloppe une fonction scalaire vectorisée et mémorise ses 
+    valeurs, de sorte qu'une même énergie (par exemple une borne de 
+    cadre lors du raffinement par brentq) n'est intégrée qu'une fois.
+
+    Arguments
+    ---------
+    func : function --> float
+        Une fonction scalaire vectorisée (acceptant un tableau 
+        d'arguments).
     """
-    f_0 = func(val_0) # calcul de la valeur initiale de la fonction
-    i = 0 # initialise le compteur
 
-    while i < max_iter:
-        i += 1 # incrémente
-        val_1 = val_0 + i*D # met à jour la valeur de val_1
-        f_1 = func(val_1) # fonction évaluée à x_1
+    def __init__(self, func):
+        self.func = func
+        self.valeurs = {}
 
-        # retourne un cadre si la condition f(x_1) = -f(x_0) est respectée (dans l'intervalle de tolérance relative rtol)
-        if np.isclose(-f_0, f_1, rtol=rtol): 
-            return (val_0, val_1) # retourne le cadre
+    def __call__(self, E):
+        E = np.asarray(E, dtype=float)
+        E_liste = E.ravel().tolist()
 
-    return None
+        # les valeurs manquantes sont calculées en un seul appel vectorisé
+        manquants = [e for e in dict.fromkeys(E_liste) if e not in self.valeurs]
+        if manquants:
+            f_manquants = np.atleast_1d(self.func(np.array(manquants)))
+            self.valeurs.update(zip(manquants, f_manquants.tolist()))
 
+        f = np.array([self.valeurs[e] for e in E_liste]).reshape(E.shape)
 
-def trouver_premiers_cadres(func, val_0,  N, D=-0.01, rtol=0.1, max_iter=20, val_max=10):
-    """ Fonction qui cadre les N premières racines.
+        return f[()] if E.ndim == 0 else f
+
+
+def trouver_premiers_cadres(func, val_0, N, D=0.01, val_max=10):
+    """ Fonction qui cadre les N premières racines en repérant 
+    les changements de signe de la fonction sur un balayage.
     
     Arguments
     ---------
     func : function --> float
-        Une fonction scalaire pour laquelle on cherche à 
-        cadrer une racine.
+        Une fonction scalaire vectorisée (acceptant un tableau 
+        d'arguments) pour laquelle on cherche à cadrer une racine.
     val_0 : float
         Valeur initiale du balayage pour le cadrage de racines
         en fonction de l'énergie.
     N : int
         Nombre de solutions à trouver.
     D : float
-        Le pas de l'algoritme de cadrage de racine.
-    rtol : float
-        La tolérance relative employée dans le processus de 
-        cadrage de racine pour l'équation f(x_1) = -f(x_0).
-    max_iter : int
-        Le nombre maximal de pas dans le processus de cadrage 
-        avant d'avancer la borne val_0.
+        Le pas du balayage (seule sa valeur absolue est utilisée).
     val_max : float
         L'énergie maximale permise pour les solutions.
 
     Retour
     ------
     list[tuple(size=2)]
-        Retourne les cadres des racines.
+        Retourne les cadres des racines. Une racine exactement sur 
+        le balayage donne le cadre dégénéré (E, E).
     """
-    liste_cadres = [] # initialise liste de cadres
-
-    # Boucle autant que le nombre de cadres n'est pas trouvé ou que la valeur maximale n'est pas atteinte
-    while val_0 < val_max and len(liste_cadres) < N :
-        # Essaie de trouver un cadre dans l'intervalle |D|*max_iter
-        cadre = generateur_cadre(func, val_0, D, rtol, max_iter)
+    # balayage de l'énergie évalué en un seul appel vectorisé
+    E_arr = np.arange(val_0, val_max, np.abs(D))
+    f_arr = func(E_arr)
 
-        if cadre is not None:
-            # Si le cadre existe, il est rajouté à la liste
-            liste_cadres.append(cadre)
+    # cadres où la fonction change strictement de signe entre deux énergies consécutives
+    idx = np.flatnonzero(f_arr[:-1]*f_arr[1:] < 0)
+    cadres = [(float(E_arr[i]), float(E_arr[i + 1])) for i in idx]
 
-        val_0 += np.abs(D)*max_iter # incrémente la région de recherche
+    # une racine tombant exactement sur le balayage n'est comptée qu'une fois (cadre dégénéré)
+    cadres += [(float(E_arr[i]), float(E_arr[i])) for i in np.flatnonzero(f_arr == 0)]
+    cadres.sort()
 
-    if val_max == val_0:
+    if len(cadres) < N:
         # Soulève une erreur si la valeur maximale est atteinte
         raise RuntimeError(f"Valeur maximale de E={val_max}")
 
-    return liste_cadres
+    return cadres[:N]
 
 
-def trouver_premieres_racines(func, val_0,  N, D=-0.01, rtol=0.1, max_iter=20, val_max=10):
+def trouver_premieres_racines(func, val_0, N, D=0.01, val_max=10, n_processus=1):
     """ Permet de trouver les racines d'une fonction en 
     cadrant d'abord ses solutions avec trouver_premiers_cadres.
     
     Arguments
     ---------
     func : function --> float
-        Une fonction scalaire pour laquelle on cherche à 
-        cadrer une racine.
+        Une fonction scalaire vectorisée (acceptant un tableau 
+        d'arguments) pour laquelle on cherche à cadrer une racine.
     val_0 : float
         Valeur initiale du balayage pour le cadrage de racines
         en fonction de l'énergie.
     N : int
         Nombre de solutions à trouver.
     D : float
-        Le pas de l'algoritme de cadrage de racine.
-    rtol : float
-        La tolérance relative employée dans le processus de 
-        cadrage de racine pour l'équation f(x_1) = -f(x_0).
-    max_iter : int
-        Le nombre maximal de pas dans le processus de cadrage 
-        avant d'avancer la borne val_0.
+        Le pas du balayage de cadrage de racine.
     val_max : float
         L'énergie maximale permise pour les solutions.
+    n_processus : int or None
+        Le nombre de processus utilisés pour trouver les racines des 
+        cadres en parallèle (None pour utiliser tous les coeurs). `func` 
+        doit alors pouvoir être sérialisée (pas de lambda).
 
     Retour
     ------
     list[float]
         Les racines de la fonction `func`.
     """
-    racines = [] # initialize la liste de racines
-    
+    # Les valeurs du balayage sont réutilisées aux bornes des cadres
+    func = FonctionMemoisee(func)
+
     # Essaie de trouver les N premiers cadres
-    cadres = trouver_premiers_cadres(func, val_0,  N, D=D, rtol=rtol, max_iter=max_iter, val_max=val_max)
+    cadres = trouver_premiers_cadres(func, val_0, N, D=D, val_max=val_max)
 
-    for i in range(len(cadres)):
+    if n_processus == 1:
         # Trouve la racine dans chaque cadre
-        racines.append(brentq(func, *cadres[i]))
+        return [polir_racine(func, cadre) for cadre in cadres]
 
-    return racines
\ No newline at end of file
+    # Les cadres étant indépendants, les racines sont trouvées en parallèle
+    with ProcessPoolExecutor(max_workers=n_processus) as executeur:
+        return list(executeur.map(polir_racine, repeat(func), cadres))
+
+
+def polir_racine(func, cadre):
+    """ Trouve la racine d'une fonction à l'intérieur d'un cadre 
+    obtenu par trouver_premiers_cadres.
+
+    Arguments
+    ---------
+    func : function --> float
+        Une fonction scalaire pour laquelle on cherche une racine.
+    cadre : tuple(size=2)
+        Le cadre contenant la racine.
+
+    Retour
+    ------
+    float
+        La racine de la fonction `func` dans le cadre.
+    """
+    return brentq(func, *cadre)
\ No newline at end of file